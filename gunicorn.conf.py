@@ -0,0 +1,15 @@
+# Gunicorn settings, picked up automatically from the working directory.
+# /chat spends almost all of its time waiting on Gemini, so we serve requests
+# from a pool of threads instead of blocking a whole worker per request.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+# One process keeps a single copy of the context cache, retrieval index and
+# in-flight requests; threads give the concurrency for the network waits.
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Long answers can take longer than gunicorn's default 30s to generate
+timeout = 120
@@ -1,6 +1,7 @@
 import os
-import json
-import glob
+import re
+import hashlib
+import orjson
 from google import genai
 from google.genai.types import Content, GenerateContentConfig # <-- Import the parent config class
 from dotenv import load_dotenv
@@ -19,30 +20,72 @@ CONTEXT_FILE_PATH = "IMP" # <-- Using the JSON file name
 
 directory = os.getcwd()
 
-def load_and_parse_json(file_path):
+# Tooling files that can sit next to the context JSON but are never context
+SKIP_JSON_FILES = {"package.json", "package-lock.json"}
+
+WHITESPACE_RUN = re.compile(r"\s+")
+
+def compact_text(text):
+    """Collapses whitespace runs (including newlines) into single spaces.
+
+    "|" separates fields in the context format, so any inside the text
+    becomes "/" to keep each line unambiguous.
+    """
+    return WHITESPACE_RUN.sub(" ", str(text)).strip().replace("|", "/")
+
+def format_interview(data, file_path):
     """
-    For the interview transcripts of following structure:
+    For already-parsed interview transcripts of following structure:
     [
         {"speaker": "...", "question": "...", "answer": "..."},
         ...
     ]
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    parts = [f"=== Interview File: {os.path.basename(file_path)} ==="]
+    speakers = list(dict.fromkeys(entry.get("speaker", "Unknown") for entry in data))
+    name = os.path.splitext(os.path.basename(file_path))[0]
 
+    # Speakers are named once in the header; only mixed-speaker files tag each entry
+    parts = [f"=== Interview: {name} ({', '.join(speakers)}) ==="]
     for entry in data:
-        speaker = entry.get("speaker", "Unknown")
-        question = entry.get("question", "")
-        answer = entry.get("answer", "")
-        parts.append(f"\n{speaker}:\nQ: {question}\nA: {answer}")
-
-    return "\n".join(parts)
+        line = f"{compact_text(entry.get('question', ''))}|{compact_text(entry.get('answer', ''))}"
+        if len(speakers) > 1:
+            line = f"{compact_text(entry.get('speaker', 'Unknown'))}|{line}"
+        parts.append(line)
+    return "\n\n".join(parts)
 
-def load_survey_json(file_path):
+def format_value(value):
+    """Renders a single survey value; nested dicts become "k=v, ..." lists."""
+    if isinstance(value, dict):
+        return ", ".join(
+            f"{k}=({format_value(v)})" if isinstance(v, dict) else f"{k}={format_value(v)}"
+            for k, v in value.items()
+        )
+    if isinstance(value, float):
+        # Drops float noise such as 11.600000000000001
+        return f"{value:.10g}"
+    return str(value)
+
+def format_values(values):
     """
-    Loads survey analytics JSON:
+    Renders survey values as compact "key: value" lines, e.g.
+    "Age Category: 45 and above=39.5, 18 to 24=36.7". Much cheaper in
+    tokens than pretty-printed JSON.
+    """
+    if not isinstance(values, dict):
+        return [format_value(values)]
+    return [f"{key}: {format_value(value)}" for key, value in values.items()]
+
+def is_duplicate_block(block, seen):
+    """Records the block's hash in `seen`; returns True if it was already there."""
+    h = hashlib.blake2b(block.encode("utf-8"), digest_size=16).digest()
+    if h in seen:
+        return True
+    seen.add(h)
+    return False
+
+def format_survey(data, file_path, seen=None):
+    """
+    Formats already-parsed survey analytics JSON:
     {
         "survey_summary": {...},
         "free_text_insights": {...}
@@ -50,47 +93,60 @@ def load_survey_json(file_path):
 
     Converts it into readable text for LLM context.
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    # Hashes of blocks already emitted, shared across files so repeated
+    # sections (common in survey exports) are only sent to the model once
+    if seen is None:
+        seen = set()
 
-    parts = [f"=== Survey Analytics File: {os.path.basename(file_path)} ==="]
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    parts = [f"=== Survey: {name} ==="]
 
     # Survey Summary
     if "survey_summary" in data:
-        parts.append("\n--- SURVEY SUMMARY ---")
         for section, values in data["survey_summary"].items():
-            parts.append(f"\n[{section.upper()}]")
-            parts.append(json.dumps(values, indent=2))
+            block = "\n".join([f"[{section.upper()}]"] + format_values(values))
+            if is_duplicate_block(block, seen):
+                block = f"(see earlier [{section.upper()}])"
+            parts.append(block)
 
     # Free Text Insights
     if "free_text_insights" in data:
-        parts.append("\n--- FREE TEXT INSIGHTS ---")
         for question, summary in data["free_text_insights"].items():
-            parts.append(f"\nQ: {question}\nSummary: {summary}")
+            line = f"{compact_text(question)}|{compact_text(summary)}"
+            if not is_duplicate_block(line, seen):
+                parts.append(line)
+    return "\n\n".join(parts)
 
-    return "\n".join(parts)
 
+def list_json_paths(folder_path):
+    """Returns the sorted paths of the context .json files directly inside the folder."""
+    with os.scandir(folder_path) as entries:
+        return sorted(
+            e.path for e in entries
+            if e.name.endswith(".json") and e.name not in SKIP_JSON_FILES and e.is_file()
+        )
 
 def load_all_json_from_folder(folder_path):
     """
     Loads all .json files in the supplied folder: interview and survey.
     """
-    json_paths = sorted(glob.glob(os.path.join(folder_path, "*.json")))
+    json_paths = list_json_paths(folder_path)
     parts = []
+    seen_blocks = set()
 
     for path in json_paths:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
 
         # A: Interview JSON (list)
         if isinstance(data, list):
-            parts.append(load_and_parse_json(path))
+            parts.append(format_interview(data, path))
 
         # B: Survey JSON (dict)
         elif isinstance(data, dict) and (
             "survey_summary" in data or "free_text_insights" in data
         ):
-            parts.append(load_survey_json(path))
+            parts.append(format_survey(data, path, seen_blocks))
 
         else:
             print(f"Skipping unrecognized JSON format: {path}")
@@ -102,7 +158,7 @@ def load_all_json_from_folder(folder_path):
 full_interview_context = load_all_json_from_folder(directory)
 
 #3. Construct the Prompt
-SYSTEM_INSTRUCTION = """
+SYSTEM_INSTRUCTION = f"""
 You are an analytical assistant, built to answer questions that cafe entreprenuers have when starting a new cafe. 
 You DO NOT just repeat or summarize the context provided.
 
@@ -117,38 +173,31 @@ Your goals:
 
 Be concise, analytical, and insight-driven.
 
+Context format: interview entries are written as question|answer (speaker|question|answer when a transcript has several speakers), survey metrics as key: value.
+
 --- INTERVIEW CONTEXT START ---
 {full_interview_context}
 --- INTERVIEW CONTEXT END ---
 """
 
 #4. User Query
-user_query = "when did the fat labrador cafe open?"
-
-contents = [
-    # System instruction + context combined as user message
-    Content(
-        role="user",
-        parts=[genai.types.Part.from_text(text=SYSTEM_INSTRUCTION)]
-    ),
-
-    # Context
-    Content(
-        role="user",
-        parts=[genai.types.Part.from_text(text=full_interview_context)]
-    ),
-
-    # Actual query
-    Content(
-        role="user",
-        parts=[genai.types.Part.from_text(text=user_query)]
-    )
-]
+# Only run the demo query when executed directly, never on import
+if __name__ == '__main__':
+    user_query = "when did the fat labrador cafe open?"
+
+    contents = [
+        # Actual query
+        Content(
+            role="user",
+            parts=[genai.types.Part.from_text(text=user_query)]
+        )
+    ]
 
-response = client.models.generate_content(
-    model=MODEL_NAME,
-    contents=contents,
-    config=GenerateContentConfig(temperature=0.2)
-)
+    response = client.models.generate_content(
+        model=MODEL_NAME,
+        contents=contents,
+        # System instruction + context go in the config, not as a user message
+        config=GenerateContentConfig(system_instruction=SYSTEM_INSTRUCTION, temperature=0.2)
+    )
 
-print("Chatbot Response:\n", response.text)
\ No newline at end of file
+    print("Chatbot Response:\n", response.text)
\ No newline at end of file
@@ -1,14 +1,60 @@
 import os
-import json
-import glob
-from flask import Flask, request, jsonify
+import re
+import hashlib
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import numpy as np
+import orjson
+from cachetools import TTLCache
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from google import genai
-from google.genai.types import Content, GenerateContentConfig, Part
+from google.genai import errors
+from google.genai.types import (
+    Content, CreateCachedContentConfig, EmbedContentConfig, GenerateContentConfig, Part,
+    UpdateCachedContentConfig
+)
 from dotenv import load_dotenv
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Serializes request and response bodies with orjson instead of the stdlib encoder."""
+
+    @staticmethod
+    def options(sort_keys=False, indent=None):
+        """Maps the json.dumps arguments Flask uses onto orjson option flags."""
+        option = 0
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            # orjson only supports two-space indentation
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        option = self.options(kwargs.get("sort_keys", False), kwargs.get("indent"))
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        """Like DefaultJSONProvider.response, but hands orjson's bytes straight to
+        the response instead of round-tripping them through str."""
+        obj = self._prepare_response_obj(args, kwargs)
+        # Same pretty-printing rule as Flask: indent in debug mode unless compact is set
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        option = self.options(self.sort_keys, indent) | orjson.OPT_APPEND_NEWLINE
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option),
+            mimetype=self.mimetype
+        )
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # 1. Setup Flask and Environment
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 load_dotenv()
 
@@ -17,67 +63,210 @@ client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
 print("Gemini Client initialized successfully.")
 
 MODEL_NAME = 'gemini-2.5-flash'
+EMBEDDING_MODEL_NAME = 'text-embedding-004'
 DIRECTORY = os.getcwd()
 
+# Tooling files that can sit next to the context JSON but are never context
+SKIP_JSON_FILES = {"package.json", "package-lock.json"}
+
+# Threads used to read and parse the context files at startup
+LOAD_WORKERS = 8
+
+# Bump whenever the context text format changes so stale disk caches are ignored
+CONTEXT_FORMAT_VERSION = 5
+
+# How long the server-side context cache lives before we recreate it
+CONTEXT_CACHE_TTL_SECONDS = 3600
+# How long to wait before retrying after the cache could not be created
+CONTEXT_CACHE_RETRY_SECONDS = 300
+
+# Retrieval settings, used when the full context can't be served from the cache
+RETRIEVAL_TOP_K = 8
+RETRIEVAL_TOKEN_BUDGET = 4000
+# Maximum number of texts per embed_content request
+EMBED_BATCH_SIZE = 100
+
+# Answers to repeated questions are served from memory for this long
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL_SECONDS = 3600
+# How long a request waits on an identical in-flight one (below gunicorn's timeout)
+IN_FLIGHT_WAIT_SECONDS = 90
+
 # Global variable to store context so we don't reload files on every request
 FULL_INTERVIEW_CONTEXT = ""
 
 # --- Helper Functions (Same as your original code) ---
 
-def load_and_parse_json(file_path):
-    """Parses interview transcripts."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+WHITESPACE_RUN = re.compile(r"\s+")
 
-    parts = [f"=== Interview File: {os.path.basename(file_path)} ==="]
+def compact_text(text):
+    """Collapses whitespace runs (including newlines) into single spaces.
+
+    "|" separates fields in the context format, so any inside the text
+    becomes "/" to keep each line unambiguous.
+    """
+    return WHITESPACE_RUN.sub(" ", str(text)).strip().replace("|", "/")
+
+def format_interview(data, file_path):
+    """Formats already-parsed interview transcripts."""
+    speakers = list(dict.fromkeys(entry.get("speaker", "Unknown") for entry in data))
+    name = os.path.splitext(os.path.basename(file_path))[0]
+
+    # Speakers are named once in the header; only mixed-speaker files tag each entry
+    parts = [f"=== Interview: {name} ({', '.join(speakers)}) ==="]
     for entry in data:
-        speaker = entry.get("speaker", "Unknown")
-        question = entry.get("question", "")
-        answer = entry.get("answer", "")
-        parts.append(f"\n{speaker}:\nQ: {question}\nA: {answer}")
-    return "\n".join(parts)
-
-def load_survey_json(file_path):
-    """Parses survey analytics."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    parts = [f"=== Survey Analytics File: {os.path.basename(file_path)} ==="]
-    
+        line = f"{compact_text(entry.get('question', ''))}|{compact_text(entry.get('answer', ''))}"
+        if len(speakers) > 1:
+            line = f"{compact_text(entry.get('speaker', 'Unknown'))}|{line}"
+        parts.append(line)
+    return "\n\n".join(parts)
+
+def format_value(value):
+    """Renders a single survey value; nested dicts become "k=v, ..." lists."""
+    if isinstance(value, dict):
+        return ", ".join(
+            f"{k}=({format_value(v)})" if isinstance(v, dict) else f"{k}={format_value(v)}"
+            for k, v in value.items()
+        )
+    if isinstance(value, float):
+        # Drops float noise such as 11.600000000000001
+        return f"{value:.10g}"
+    return str(value)
+
+def format_values(values):
+    """Renders survey values as compact "key: value" lines."""
+    if not isinstance(values, dict):
+        return [format_value(values)]
+    return [f"{key}: {format_value(value)}" for key, value in values.items()]
+
+def is_duplicate_block(block, seen):
+    """Records the block's hash in `seen`; returns True if it was already there."""
+    h = hashlib.blake2b(block.encode("utf-8"), digest_size=16).digest()
+    if h in seen:
+        return True
+    seen.add(h)
+    return False
+
+def format_survey(data, file_path, seen=None):
+    """Formats already-parsed survey analytics."""
+    # Hashes of blocks already emitted, shared across files so repeated
+    # sections (common in survey exports) are only sent to the model once
+    if seen is None:
+        seen = set()
+
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    parts = [f"=== Survey: {name} ==="]
+
     if "survey_summary" in data:
-        parts.append("\n--- SURVEY SUMMARY ---")
         for section, values in data["survey_summary"].items():
-            parts.append(f"\n[{section.upper()}]")
-            parts.append(json.dumps(values, indent=2))
+            block = "\n".join([f"[{section.upper()}]"] + format_values(values))
+            if is_duplicate_block(block, seen):
+                block = f"(see earlier [{section.upper()}])"
+            parts.append(block)
 
     if "free_text_insights" in data:
-        parts.append("\n--- FREE TEXT INSIGHTS ---")
         for question, summary in data["free_text_insights"].items():
-            parts.append(f"\nQ: {question}\nSummary: {summary}")
+            line = f"{compact_text(question)}|{compact_text(summary)}"
+            if not is_duplicate_block(line, seen):
+                parts.append(line)
+    return "\n\n".join(parts)
+
+
+def list_json_paths(folder_path):
+    """Returns the sorted paths of the context .json files directly inside the folder."""
+    with os.scandir(folder_path) as entries:
+        return sorted(
+            e.path for e in entries
+            if e.name.endswith(".json") and e.name not in SKIP_JSON_FILES and e.is_file()
+        )
+
+def context_cache_path(folder_path, json_paths):
+    """Returns the disk cache file for the current set of JSON files."""
+    key = repr((os.path.basename(__file__), CONTEXT_FORMAT_VERSION,
+                sorted((p, os.path.getmtime(p)) for p in json_paths)))
+    h = hashlib.md5(key.encode("utf-8")).hexdigest()
+    return os.path.join(folder_path, f".ctx_cache_{h}.txt")
+
+def write_context_cache(folder_path, cache_path, context):
+    """Atomically writes the context cache and removes caches from older builds.
 
-    return "\n".join(parts)
+    The text goes to a temp file that is swapped into place, so a crash or a
+    second worker reading at the same time never sees a partial cache.
+    """
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=folder_path, prefix=".ctx_cache_", suffix=".tmp")
+    except OSError as e:
+        print(f"Could not write context cache {cache_path}: {e}")
+        return
+
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(context)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Could not write context cache {cache_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return
+
+    with os.scandir(folder_path) as entries:
+        stale = [e.path for e in entries
+                 if e.name.startswith(".ctx_cache_") and e.name.endswith(".txt") and e.path != cache_path]
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Could not remove stale context cache {path}: {e}")
+
+def read_json(path):
+    """Reads and parses one JSON file; returns None if it can't be read."""
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    except Exception as e:
+        print(f"Error reading {path}: {e}")
+        return None
 
 def load_all_json_from_folder(folder_path):
     """Loads all .json files in the supplied folder."""
-    json_paths = sorted(glob.glob(os.path.join(folder_path, "*.json")))
+    json_paths = list_json_paths(folder_path)
+
+    # Reuse the merged context from a previous boot if no JSON file changed
+    cache_path = context_cache_path(folder_path, json_paths)
+    if os.path.exists(cache_path):
+        print(f"Loaded context from cache: {os.path.basename(cache_path)}")
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+
     parts = []
+    seen_blocks = set()
 
-    for path in json_paths:
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+    # Reading and parsing is I/O-bound and independent per file, so it runs on a
+    # thread pool; formatting stays sequential to keep file order and dedup stable
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        decoded = list(executor.map(read_json, json_paths))
 
+    for path, data in zip(json_paths, decoded):
+        if data is None:
+            continue
+
+        try:
             if isinstance(data, list):
-                parts.append(load_and_parse_json(path))
+                parts.append(format_interview(data, path))
             elif isinstance(data, dict) and ("survey_summary" in data or "free_text_insights" in data):
-                parts.append(load_survey_json(path))
+                parts.append(format_survey(data, path, seen_blocks))
             else:
                 print(f"Skipping unrecognized JSON format: {path}")
         except Exception as e:
-            print(f"Error reading {path}: {e}")
+            print(f"Error formatting {path}: {e}")
 
     print(f"\nLoaded {len(parts)} JSON context blocks from '{folder_path}'")
-    return "\n\n".join(parts)
+    context = "\n\n".join(parts)
+
+    write_context_cache(folder_path, cache_path, context)
+    return context
 
 # --- Initialization Block ---
 # We load the data immediately when the app starts
@@ -85,9 +274,384 @@ with app.app_context():
     print("Loading context files...")
     FULL_INTERVIEW_CONTEXT = load_all_json_from_folder(DIRECTORY)
 
+INSTRUCTION_TEXT = """
+You are an analytical assistant, built to answer questions that cafe entrepreneurs have when starting a new cafe. 
+You DO NOT just repeat or summarize the context provided.
+
+Your goals:
+1. Use the interview transcript contexts as background knowledge.
+2. Use the survey analytics as a customer perspective to cafe-going.
+3. Use both transcripts and survey to give holistic answers.
+4. Think beyond explicit text.
+5. Infer patterns, motives, insights, and deeper meanings.
+6. Provide thoughtful, evaluative, and analytical answers.
+
+Context format: interview entries are written as question|answer (speaker|question|answer when a transcript has several speakers), survey metrics as key: value.
+"""
+
+def build_system_instruction(context):
+    """Wraps the given context in the assistant's instructions."""
+    return f"""{INSTRUCTION_TEXT}
+--- INTERVIEW CONTEXT START ---
+{context}
+--- INTERVIEW CONTEXT END ---
+"""
+
+SYSTEM_INSTRUCTION = build_system_instruction(FULL_INTERVIEW_CONTEXT)
+
+# --- Context Cache ---
+# The system instruction (and the context inside it) is identical for every
+# request, so we pin it as cached content on Gemini's side and only send the
+# user query per request.
+_context_cache = {"name": None, "expires_at": 0.0}
+_context_cache_lock = threading.Lock()
+
+def delete_context_cache(name):
+    """Best-effort delete, so a replaced cache isn't billed until its TTL runs out."""
+    try:
+        client.caches.delete(name=name)
+    except Exception as e:
+        print(f"Could not delete context cache {name}: {e}")
+
+def get_context_cache_name():
+    """Returns the name of a live context cache, creating one if needed.
+
+    Returns None when caching is unavailable (e.g. the context is below the
+    model's minimum cacheable size); callers then send the full prompt.
+    """
+    with _context_cache_lock:
+        if time.monotonic() < _context_cache["expires_at"]:
+            return _context_cache["name"]
+
+        name = _context_cache["name"]
+        if name:
+            # Extend the live cache instead of re-uploading the whole context
+            try:
+                client.caches.update(
+                    name=name,
+                    config=UpdateCachedContentConfig(ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s")
+                )
+                _context_cache["expires_at"] = time.monotonic() + CONTEXT_CACHE_TTL_SECONDS - 60
+                return name
+            except Exception as e:
+                print(f"Could not extend context cache {name}, recreating it: {e}")
+                _context_cache["name"] = None
+                delete_context_cache(name)
+
+        try:
+            cache = client.caches.create(
+                model=MODEL_NAME,
+                config=CreateCachedContentConfig(
+                    display_name="interview-context",
+                    system_instruction=SYSTEM_INSTRUCTION,
+                    ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s"
+                )
+            )
+            _context_cache["name"] = cache.name
+            # Refresh a minute early so requests never reference an expired cache
+            _context_cache["expires_at"] = time.monotonic() + CONTEXT_CACHE_TTL_SECONDS - 60
+            print(f"Created context cache: {cache.name}")
+        except Exception as e:
+            print(f"Context caching unavailable, sending full prompt instead: {e}")
+            _context_cache["name"] = None
+            _context_cache["expires_at"] = time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+
+        return _context_cache["name"]
+
+def invalidate_context_cache(error, config):
+    """Drops the context cache if Gemini rejected the call because of it.
+
+    Returns True when the call used the cache and the error points at the
+    cache itself (not found / no access, or an error naming cachedContent),
+    so the caller should retry once. Other errors, such as an invalid query,
+    leave the cache alone.
+    """
+    cache_name = config.cached_content
+    if not cache_name:
+        return False
+    if error.code not in (403, 404) and "cachedcontent" not in str(error).lower():
+        return False
+
+    print(f"Context cache {cache_name} was rejected, recreating it: {error}")
+    with _context_cache_lock:
+        # Another request may already have replaced it
+        if _context_cache["name"] != cache_name:
+            return True
+        _context_cache["name"] = None
+        _context_cache["expires_at"] = 0.0
+    delete_context_cache(cache_name)
+    return True
+
+get_context_cache_name()
+
+# --- Retrieval ---
+# Without the cache, sending the whole corpus on every request is slow and
+# dilutes the answer, so we embed the context once and only send the chunks
+# most relevant to each query. The index is built on a background thread so
+# no user request ever waits on the embedding calls.
+# "index" holds (chunks, token counts, normalized embedding matrix) once built
+_chunk_index = {"index": None, "retry_at": 0.0}
+_chunk_index_lock = threading.Lock()
+
+def split_context_chunks(context):
+    """Splits the merged context into one chunk per interview entry or survey section.
+
+    Each chunk keeps the "=== ... ===" file header it came from so the model
+    still knows which cafe or survey the text belongs to. Deduplicated survey
+    sections ("(see earlier [SECTION])") are skipped: the original block is
+    already its own chunk, and the placeholder means nothing when retrieved alone.
+    """
+    chunks = []
+    header = ""
+    for block in context.split("\n\n"):
+        lines = block.strip().split("\n")
+        # Peel off file headers and section banners, remembering the file
+        while lines and (lines[0].startswith("=== ") or lines[0].startswith("--- ")):
+            if lines[0].startswith("=== "):
+                header = lines[0]
+            lines.pop(0)
+
+        text = "\n".join(lines).strip()
+        if text and not text.startswith("(see earlier ["):
+            chunks.append(f"{header}\n{text}" if header else text)
+    return chunks
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+def count_chunk_tokens(chunk):
+    """Exact token count for a chunk, or None if the API call fails."""
+    try:
+        return client.models.count_tokens(model=MODEL_NAME, contents=chunk).total_tokens
+    except Exception:
+        return None
+
+def build_chunk_index():
+    """Embeds the context chunks for retrieval, scheduling a retry if that fails.
+
+    Token counts are computed once here, off the request path, so the
+    per-request budget check is a lookup instead of a tokenizer call.
+    """
+    with _chunk_index_lock:
+        if _chunk_index["index"] is not None or time.monotonic() < _chunk_index["retry_at"]:
+            return
+
+        try:
+            chunks = split_context_chunks(FULL_INTERVIEW_CONTEXT)
+            if not chunks:
+                raise ValueError("the context is empty")
+
+            vectors = []
+            for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+                result = client.models.embed_content(
+                    model=EMBEDDING_MODEL_NAME,
+                    contents=chunks[start:start + EMBED_BATCH_SIZE],
+                    config=EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
+                )
+                vectors.extend(embedding.values for embedding in result.embeddings)
+
+            with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+                token_counts = list(executor.map(count_chunk_tokens, chunks))
+
+            estimated = [i for i, count in enumerate(token_counts) if count is None]
+            for i in estimated:
+                token_counts[i] = estimate_tokens(chunks[i])
+            if estimated:
+                print(f"Token count failed for {len(estimated)} of {len(chunks)} chunks; using estimates for those.")
+
+            matrix = np.array(vectors, dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        except Exception as e:
+            print(f"Could not build the retrieval index, retrying in {CONTEXT_CACHE_RETRY_SECONDS}s: {e}")
+            _chunk_index["retry_at"] = time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+            return
+
+        _chunk_index["index"] = (chunks, token_counts, matrix)
+        print(f"Embedded {len(chunks)} context chunks for retrieval.")
+
+def start_chunk_index_build():
+    """Starts building the retrieval index in the background unless it is ready, in progress or backing off."""
+    if (_chunk_index["index"] is None
+            and time.monotonic() >= _chunk_index["retry_at"]
+            and not _chunk_index_lock.locked()):
+        threading.Thread(target=build_chunk_index, daemon=True).start()
+
+def get_chunk_index():
+    """Returns (chunks, token counts, normalized embedding matrix).
+
+    Raises if the index isn't ready yet (after kicking off a background build),
+    so callers fall back to the full context instead of waiting.
+    """
+    index = _chunk_index["index"]
+    if index is None:
+        start_chunk_index_build()
+        raise RuntimeError("retrieval index is not ready yet")
+    return index
+
+def retrieve_context(user_query):
+    """Returns the chunks most relevant to the query, most relevant first, within the token budget."""
+    chunks, token_counts, matrix = get_chunk_index()
+    result = client.models.embed_content(
+        model=EMBEDDING_MODEL_NAME,
+        contents=user_query,
+        config=EmbedContentConfig(task_type="RETRIEVAL_QUERY")
+    )
+    query_vector = np.array(result.embeddings[0].values, dtype=np.float32)
+
+    # Document vectors are normalized, so the dot product ranks by cosine similarity
+    scores = matrix @ query_vector
+    selected = []
+    used_tokens = 0
+    for i in np.argsort(-scores)[:RETRIEVAL_TOP_K]:
+        cost = token_counts[i]
+        if used_tokens + cost > RETRIEVAL_TOKEN_BUDGET:
+            continue
+        selected.append(chunks[i])
+        used_tokens += cost
+    return "\n\n".join(selected)
+
+# Without a context cache every request goes through retrieval, so start
+# embedding right away instead of on the first user's request
+if _context_cache["name"] is None:
+    start_chunk_index_build()
+
+def build_generation_request(user_query):
+    """Returns the (contents, config) to send to Gemini for this query."""
+    cache_name = get_context_cache_name()
+
+    if cache_name:
+        return [user_query], GenerateContentConfig(cached_content=cache_name, temperature=0.2)
+
+    # The instructions travel in the config's system_instruction field rather
+    # than as a user turn, so Gemini can treat (and implicitly cache) them as such
+    try:
+        system_instruction = build_system_instruction(retrieve_context(user_query))
+    except Exception as e:
+        print(f"Retrieval failed, sending full context instead: {e}")
+        system_instruction = SYSTEM_INSTRUCTION
+
+    contents = [
+        Content(
+            role="user",
+            parts=[Part.from_text(text=user_query)]
+        )
+    ]
+    return contents, GenerateContentConfig(system_instruction=system_instruction, temperature=0.2)
+
+def generate_answer(user_query):
+    """Runs the query against Gemini and returns the response text."""
+    for attempt in range(2):
+        contents, config = build_generation_request(user_query)
+        try:
+            response = client.models.generate_content(
+                model=MODEL_NAME,
+                contents=contents,
+                config=config
+            )
+            return response.text
+        except errors.ClientError as e:
+            if attempt or not invalidate_context_cache(e, config):
+                raise
+
+def stream_answer(user_query):
+    """Runs the query against Gemini, yielding the response text as it is generated."""
+    for attempt in range(2):
+        contents, config = build_generation_request(user_query)
+        streamed = False
+        try:
+            for chunk in client.models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=contents,
+                config=config
+            ):
+                if chunk.text:
+                    streamed = True
+                    yield chunk.text
+            return
+        except errors.ClientError as e:
+            # Once text has reached the client we can't transparently start over
+            if attempt or streamed or not invalidate_context_cache(e, config):
+                raise
+
+# --- Response Cache & Request Coalescing ---
+# Repeated questions are answered from memory, and concurrent requests for the
+# same question share a single Gemini call instead of each paying for it.
+_response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def normalize_query(user_query):
+    """Collapses case and whitespace so trivially different phrasings share a cache entry."""
+    return " ".join(user_query.split()).lower()
+
+def claim_query(key):
+    """Looks the query up in the cache and the in-flight table.
+
+    Returns (cached_answer, future, is_leader). When nothing is cached or in
+    flight, the caller becomes the leader: it must run the query and then
+    call finish_query() with the outcome.
+    """
+    with _in_flight_lock:
+        cached = _response_cache.get(key)
+        if cached is not None:
+            return cached, None, False
+
+        future = _in_flight.get(key)
+        if future is not None:
+            return None, future, False
+
+        future = Future()
+        _in_flight[key] = future
+        return None, future, True
+
+def finish_query(key, future, answer=None, error=None):
+    """Publishes the leader's outcome to the cache and to any waiting requests."""
+    with _in_flight_lock:
+        if error is None:
+            _response_cache[key] = answer
+        del _in_flight[key]
+
+    if error is None:
+        future.set_result(answer)
+    elif isinstance(error, Exception):
+        future.set_exception(error)
+    else:
+        # Don't re-raise e.g. GeneratorExit from a disconnected stream in other requests
+        future.set_exception(RuntimeError("The request answering this query was cancelled"))
+
+def wait_for_query(future):
+    """Waits for an identical in-flight request, bounded so a hung leader can't hang everyone."""
+    try:
+        return future.result(timeout=IN_FLIGHT_WAIT_SECONDS)
+    except FuturesTimeoutError:
+        raise TimeoutError(f"Timed out after {IN_FLIGHT_WAIT_SECONDS}s waiting for an identical in-flight request")
+
+def answer_query(user_query):
+    """Returns the answer for the query from the cache, an identical in-flight request, or Gemini."""
+    key = normalize_query(user_query)
+    cached, future, is_leader = claim_query(key)
+    if cached is not None:
+        return cached
+    if not is_leader:
+        return wait_for_query(future)
+
+    try:
+        answer = generate_answer(user_query)
+    except BaseException as e:
+        # BaseException too, so waiters are released even on e.g. KeyboardInterrupt
+        finish_query(key, future, error=e)
+        raise
+
+    finish_query(key, future, answer=answer)
+    return answer
 
 # --- Flask Routes ---
 
+@app.route('/', methods=['GET'])
+def home():
+    return "Gemini RAG Server is Running!"
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "active", "model": MODEL_NAME}), 200
@@ -96,59 +660,80 @@ def health_check():
 def chat():
     """
     Expects JSON input: { "query": "your question here" }
+    ("message" is also accepted, for clients of the old app.py server)
     """
     data = request.get_json()
-    user_query = data.get('query')
+    user_query = data.get('query') or data.get('message')
 
-    if not user_query:
+    # Anything but a non-empty string (e.g. {"query": 5}) would fail in normalize_query
+    if not isinstance(user_query, str) or not user_query:
         return jsonify({"error": "No 'query' provided in request body"}), 400
 
-    # Construct System Instruction
-    system_instruction_text = f"""
-    You are an analytical assistant, built to answer questions that cafe entrepreneurs have when starting a new cafe. 
-    You DO NOT just repeat or summarize the context provided.
-
-    Your goals:
-    1. Use the interview transcript contexts as background knowledge.
-    2. Use the survey analytics as a customer perspective to cafe-going.
-    3. Use both transcripts and survey to give holistic answers.
-    4. Think beyond explicit text.
-    5. Infer patterns, motives, insights, and deeper meanings.
-    6. Provide thoughtful, evaluative, and analytical answers.
-
-    --- INTERVIEW CONTEXT START ---
-    {FULL_INTERVIEW_CONTEXT}
-    --- INTERVIEW CONTEXT END ---
-    """
-
     try:
-        # Construct the content payload
-        # Note: We pass the system instruction as the first user part here based on your original logic.
-        # Ideally, system instructions should go into the config, but this works for context injection.
-        contents = [
-            Content(
-                role="user",
-                parts=[Part.from_text(text=system_instruction_text)]
-            ),
-            Content(
-                role="user",
-                parts=[Part.from_text(text=user_query)]
-            )
-        ]
-
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=contents,
-            config=GenerateContentConfig(temperature=0.2)
-        )
-
         return jsonify({
-            "response": response.text
+            "response": answer_query(user_query)
         })
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def format_sse(text, event=None):
+    """Formats text as one server-sent event, prefixing every line with 'data:'."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in text.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Expects JSON input: { "query": "your question here" }
+    ("message" is also accepted, as for /chat)
+    Streams the answer as server-sent events as soon as Gemini produces it,
+    followed by a final "done" event (or an "error" event on failure).
+    """
+    data = request.get_json()
+    user_query = data.get('query') or data.get('message')
+
+    # Anything but a non-empty string (e.g. {"query": 5}) would fail in normalize_query
+    if not isinstance(user_query, str) or not user_query:
+        return jsonify({"error": "No 'query' provided in request body"}), 400
+
+    key = normalize_query(user_query)
+
+    # A plain sync generator: Flask streams it chunk by chunk without buffering
+    def generate():
+        cached, future, is_leader = claim_query(key)
+        if cached is not None:
+            yield format_sse(cached)
+        elif not is_leader:
+            # An identical request is already running; send its answer whole
+            try:
+                yield format_sse(wait_for_query(future))
+            except Exception as e:
+                yield format_sse(str(e), event="error")
+                return
+        else:
+            pieces = []
+            try:
+                for text in stream_answer(user_query):
+                    pieces.append(text)
+                    yield format_sse(text)
+            except Exception as e:
+                finish_query(key, future, error=e)
+                yield format_sse(str(e), event="error")
+                return
+            except BaseException as e:
+                # e.g. GeneratorExit when the client disconnects mid-stream
+                finish_query(key, future, error=e)
+                raise
+
+            finish_query(key, future, answer="".join(pieces))
+
+        yield format_sse("", event="done")
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 if __name__ == '__main__':
     # Run the Flask app on port 5000
     app.run(debug=True, port=5000)
\ No newline at end of file